@@ -0,0 +1,200 @@
+"""
+Agrupación (micro-batching) de consultas concurrentes al retriever
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+class EmbeddingBatcher:
+    """
+    Agrupa las consultas que llegan dentro de una ventana corta y las resuelve
+    con una sola llamada al modelo de embeddings y una sola búsqueda en FAISS.
+    """
+    def __init__(self,
+                 vectorstore: FAISS,
+                 k: int = 3,
+                 max_batch_size: int = 32,
+                 max_wait: float = 0.01,
+                 omp_threads: Optional[int] = None):
+        """
+        Args:
+            vectorstore: Vectorstore FAISS sobre el que se busca; su función de embeddings
+                debe ser QuantizedMiniLMEmbeddings (se usa `embed_array`).
+            k: Número de documentos a recuperar por consulta.
+            max_batch_size: Número máximo de consultas por lote.
+            max_wait: Segundos que se espera a más consultas antes de procesar un lote.
+            omp_threads: Hilos OpenMP de FAISS en el hilo de búsqueda (None usa todos los núcleos).
+        """
+        self.vectorstore = vectorstore
+        self.k = k
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.omp_threads = omp_threads
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def search(self, query: str, ef_search: Optional[int] = None) -> List[Document]:
+        """
+        Encola una consulta y espera a que se resuelva su lote.
+
+        Args:
+            query: Texto de la consulta.
+            ef_search: efSearch de HNSW para esta consulta (None usa el del índice).
+        """
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, ef_search, future))
+        return await future
+
+    def search_sync(self, query: str, ef_search: Optional[int] = None) -> List[Document]:
+        """Resuelve una consulta de forma síncrona, sin pasar por la cola."""
+        return self._search_batch([query], [ef_search])[0]
+
+    def set_omp_threads(self, num_threads: int) -> None:
+        """
+        Cambia los hilos OpenMP de FAISS para las búsquedas. En libgomp el valor es por hilo,
+        así que se aplica en el inicializador del hilo de búsqueda, que se recrea en el próximo lote.
+        """
+        self.omp_threads = num_threads
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def aclose(self) -> None:
+        """Detiene la tarea de fondo, cancela las consultas pendientes y libera el hilo de búsqueda."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, _, future = self._queue.get_nowait()
+                future.cancel()
+            self._queue = None
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Devuelve el hilo dedicado a embeddings + búsqueda, con sus hilos OpenMP fijados."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1,
+                initializer=faiss.omp_set_num_threads,
+                initargs=(self.omp_threads or os.cpu_count() or 1,)
+            )
+        return self._executor
+
+    def _ensure_worker(self):
+        """Arranca la tarea de fondo en el event loop actual si no está activa."""
+        if self._worker is None or self._worker.done():
+            # Se reutiliza la cola existente para no dejar sin respuesta a quien ya espera en ella
+            if self._queue is None:
+                self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        """Vacía la cola en lotes y resuelve los futures de cada consulta."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[Tuple[str, Optional[int], asyncio.Future]] = [await self._queue.get()]
+            try:
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                # Embeddings y búsqueda son CPU-bound: se ejecutan fuera del event loop
+                results = await loop.run_in_executor(
+                    self._get_executor(),
+                    self._search_batch,
+                    [query for query, _, _ in batch],
+                    [ef_search for _, ef_search, _ in batch]
+                )
+            except asyncio.CancelledError:
+                # Al detener el worker, el lote ya extraído de la cola también se cancela
+                for _, _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, _, future), docs in zip(batch, results):
+                if not future.done():
+                    future.set_result(docs)
+
+    def _search_batch(self, queries: List[str], ef_searches: List[Optional[int]]) -> List[List[Document]]:
+        """
+        Genera los embeddings de todas las consultas en una sola llamada y busca en FAISS
+        con una llamada por cada valor distinto de efSearch del lote.
+        """
+        vectors = self.vectorstore.embedding_function.embed_array(queries)
+        index = self.vectorstore.index
+        indices = np.full((len(queries), self.k), -1, dtype=np.int64)
+
+        for ef_search in set(ef_searches):
+            rows = [i for i, value in enumerate(ef_searches) if value == ef_search]
+            params = None
+            if ef_search is not None and hasattr(index, "hnsw"):
+                params = faiss.SearchParametersHNSW(efSearch=ef_search)
+            _, indices[rows] = index.search(vectors[rows], self.k, params=params)
+
+        return [self._lookup(row) for row in indices]
+
+    def _lookup(self, row) -> List[Document]:
+        """Convierte una fila de posiciones de FAISS en documentos del docstore."""
+        docs = []
+        for i in row:
+            if i == -1:
+                continue
+            doc = self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[int(i)])
+            if isinstance(doc, Document):
+                docs.append(doc)
+        return docs
+
+
+class BatchedRetriever(BaseRetriever):
+    """Retriever de LangChain que resuelve las consultas a través de un EmbeddingBatcher."""
+
+    batcher: EmbeddingBatcher
+    # Las consultas cortas priorizan latencia con un efSearch menor
+    short_query_chars: int = 20
+    short_query_ef_search: Optional[int] = None
+
+    def _ef_search_for(self, query: str) -> Optional[int]:
+        """Devuelve el efSearch a usar para la consulta (None usa el del índice)."""
+        if self.short_query_ef_search is not None and len(query.strip()) < self.short_query_chars:
+            return self.short_query_ef_search
+        return None
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.batcher.search_sync(query, self._ef_search_for(query))
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        return await self.batcher.search(query, self._ef_search_for(query))
@@ -0,0 +1,115 @@
+"""
+Embeddings de MiniLM ejecutados con ONNX Runtime (modelo cuantizado INT8)
+"""
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import onnxruntime as ort
+from tokenizers import Tokenizer
+from langchain_core.embeddings import Embeddings
+
+
+class QuantizedMiniLMEmbeddings(Embeddings):
+    """
+    Implementación de `Embeddings` de LangChain sobre un MiniLM exportado a ONNX
+    y cuantizado a INT8 (ver scripts/export_minilm_onnx.py).
+    """
+    def __init__(self,
+                 model_dir: str = "./models/all-MiniLM-L6-v2-onnx-int8",
+                 model_file: str = "model_quantized.onnx",
+                 max_length: int = 256,
+                 batch_size: int = 32,
+                 intra_op_num_threads: Optional[int] = None):
+        """
+        Carga el tokenizador y la sesión de ONNX Runtime.
+
+        Args:
+            model_dir: Directorio con el modelo ONNX y el archivo tokenizer.json.
+            model_file: Nombre del archivo del modelo dentro de model_dir.
+            max_length: Número máximo de tokens por texto.
+            batch_size: Número de textos por llamada a la sesión.
+            intra_op_num_threads: Hilos de ONNX Runtime (por defecto, todos los núcleos).
+        """
+        model_path = Path(model_dir)
+        if not (model_path / model_file).exists():
+            raise FileNotFoundError(
+                f"No se encontró el modelo ONNX en {model_path / model_file}. "
+                "Ejecuta: python scripts/export_minilm_onnx.py"
+            )
+
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(str(model_path / "tokenizer.json"))
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(max_length=max_length)
+
+        self._model_file = str(model_path / model_file)
+        self._num_threads = None
+        self.set_num_threads(intra_op_num_threads or os.cpu_count())
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def set_num_threads(self, num_threads: int) -> None:
+        """Recrea la sesión de ONNX Runtime con otro número de hilos, si cambia."""
+        if num_threads == self._num_threads:
+            return
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            self._model_file,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._num_threads = num_threads
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Genera embeddings para una lista de textos."""
+        if not texts:
+            return []
+        return self.embed_array(texts).tolist()
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """
+        Genera embeddings normalizados como una matriz contigua (N, d) de float32,
+        procesando los textos en lotes consecutivos de `batch_size`.
+        """
+        return np.vstack([
+            self._embed_batch(texts[start:start + self.batch_size])
+            for start in range(0, len(texts), self.batch_size)
+        ])
+
+    def embed_query(self, text: str) -> List[float]:
+        """Genera el embedding de una consulta."""
+        return self._embed_batch([text])[0].tolist()
+
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        """Devuelve el número de tokens (tras truncar) de cada texto."""
+        return [len(e.ids) for e in self.tokenizer.encode_batch(texts)]
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Tokeniza, ejecuta el modelo y aplica mean pooling + normalización L2."""
+        encodings = self.tokenizer.encode_batch(texts)
+        max_len = max(len(e.ids) for e in encodings)
+
+        input_ids = np.zeros((len(encodings), max_len), dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), max_len), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            input_ids[row, :len(encoding.ids)] = encoding.ids
+            attention_mask[row, :len(encoding.ids)] = 1
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean pooling teniendo en cuenta el padding
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        embeddings = summed / counts
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return (embeddings / np.clip(norms, 1e-12, None)).astype(np.float32)
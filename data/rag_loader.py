@@ -2,13 +2,28 @@
 Cargador y gestor del sistema RAG (Retrieval-Augmented Generation)
 """
 import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import List, Optional
 
+import faiss
+import numpy as np
+
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from data.embedding_batcher import BatchedRetriever, EmbeddingBatcher
+from data.onnx_embeddings import QuantizedMiniLMEmbeddings
+
+
+def _load_one(path: str) -> List:
+    """Carga un único PDF. Definida a nivel de módulo para poder usarse en un pool de procesos."""
+    return PyPDFLoader(path).load()
+
 
 class RAGSystem:
     """
@@ -17,31 +32,68 @@ class RAGSystem:
     def __init__(self, 
                  pdf_dir: str = "./data/docs", 
                  index_dir: str = "./faiss_index",
-                 embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 embedding_model_dir: str = "./models/all-MiniLM-L6-v2-onnx-int8",
                  chunk_size: int = 500,
                  chunk_overlap: int = 50,
-                 retriever_k: int = 3):
+                 retriever_k: int = 3,
+                 embedding_batch_size: int = 64,
+                 index_factory: str = "HNSW32,SQ8",
+                 ef_construction: int = 200,
+                 ef_search: int = 16,
+                 nprobe: int = 8,
+                 short_query_ef_search: Optional[int] = 8):
         """
         Inicializa la configuración del sistema RAG.
         
         Args:
             pdf_dir: Directorio con los archivos PDF.
             index_dir: Directorio para guardar/cargar el índice FAISS.
-            embedding_model: Nombre del modelo de embeddings.
+            embedding_model_dir: Directorio del modelo de embeddings ONNX cuantizado.
             chunk_size: Tamaño de los fragmentos de texto.
             chunk_overlap: Superposición entre fragmentos.
             retriever_k: Número de documentos a recuperar.
+            embedding_batch_size: Textos por llamada al modelo de embeddings.
+            index_factory: Descripción del índice FAISS (formato de faiss.index_factory).
+                Por defecto, grafo HNSW con vectores cuantizados a 8 bits (SQ8).
+            ef_construction: Parámetro efConstruction de HNSW al construir el índice.
+            ef_search: Parámetro efSearch de HNSW al buscar.
+            nprobe: Listas a explorar por búsqueda en índices IVF.
+            short_query_ef_search: efSearch para consultas cortas (None desactiva el ajuste).
         """
         self.pdf_dir = Path(pdf_dir)
         self.index_dir = Path(index_dir)
-        self.embedding_model_name = embedding_model
+        self.embedding_model_dir = embedding_model_dir
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.retriever_k = retriever_k
+        self.index_factory = index_factory
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.nprobe = nprobe
+        self.short_query_ef_search = short_query_ef_search
         
-        self.embeddings = HuggingFaceEmbeddings(model_name=self.embedding_model_name)
+        self._configure_faiss()
+        self.embeddings = QuantizedMiniLMEmbeddings(
+            model_dir=self.embedding_model_dir,
+            batch_size=embedding_batch_size
+        )
         self.retriever = None
 
+    @staticmethod
+    def _configure_faiss():
+        """
+        Ajusta los hilos OpenMP de FAISS y avisa si la build no usa SIMD (AVX2/AVX-512).
+        En libgomp el número de hilos es por hilo: esto solo afecta al hilo que construye
+        el índice; las búsquedas usan el valor fijado en el hilo del EmbeddingBatcher.
+        """
+        faiss.omp_set_num_threads(os.cpu_count() or 1)
+
+        compile_options = faiss.get_compile_options()
+        print(f"FAISS {faiss.__version__} compilado con: {compile_options}")
+        if "AVX2" not in compile_options and "AVX512" not in compile_options:
+            print("Advertencia: FAISS no está usando AVX2/AVX-512; las búsquedas serán más lentas. "
+                  "Instala faiss-cpu en una CPU con AVX2 o compila FAISS con -DFAISS_OPT_LEVEL=avx512.")
+
     def setup(self):
         """
         Ejecuta el proceso completo de inicialización del sistema RAG.
@@ -51,13 +103,26 @@ class RAGSystem:
             print(f"Advertencia: No se encontraron PDFs en {self.pdf_dir} o el directorio no existe. El retriever no será inicializado.")
             return
 
-        documents = self._load_pdf_documents()
-        chunks = self._split_documents(documents)
-        vectorstore = self._get_or_create_vectorstore(chunks)
+        vectorstore = self._get_or_create_vectorstore()
+        self._tune_search(vectorstore.index)
         
-        self.retriever = vectorstore.as_retriever(search_kwargs={"k": self.retriever_k})
+        # Las consultas concurrentes se agrupan en un único embedding + búsqueda
+        self.retriever = BatchedRetriever(
+            batcher=EmbeddingBatcher(vectorstore, k=self.retriever_k),
+            short_query_ef_search=self.short_query_ef_search
+        )
         print("Sistema RAG inicializado correctamente.")
 
+    def limit_threads(self, num_threads: int) -> None:
+        """
+        Limita los hilos de ONNX Runtime y de FAISS (OpenMP) para servir consultas.
+        Se llama después de `setup`, de modo que la construcción del índice use todos los núcleos.
+        El límite de FAISS se aplica en el hilo donde el EmbeddingBatcher ejecuta las búsquedas.
+        """
+        self.embeddings.set_num_threads(num_threads)
+        if self.retriever is not None:
+            self.retriever.batcher.set_omp_threads(num_threads)
+
     def get_retriever(self):
         """
         Devuelve el retriever si ha sido inicializado.
@@ -74,12 +139,12 @@ class RAGSystem:
     def _load_pdf_documents(self) -> List:
         """Carga todos los documentos PDF de un directorio."""
         all_documents = []
-        pdf_files = [f for f in os.listdir(self.pdf_dir) if f.endswith(".pdf")]
+        paths = sorted(str(path) for path in self.pdf_dir.glob("*.pdf"))
         
-        for pdf_file in pdf_files:
-            loader = PyPDFLoader(str(self.pdf_dir / pdf_file))
-            docs = loader.load()
-            all_documents.extend(docs)
+        # Cada PDF se parsea en un proceso distinto (el parseo es CPU-bound y retiene el GIL)
+        with ProcessPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as executor:
+            for docs in executor.map(_load_one, paths):
+                all_documents.extend(docs)
             
         return all_documents
 
@@ -91,16 +156,76 @@ class RAGSystem:
         )
         return splitter.split_documents(documents)
 
-    def _get_or_create_vectorstore(self, chunks: List):
-        """Carga un vectorstore existente o crea uno nuevo."""
+    def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Genera los embeddings ordenando los textos por longitud en tokens, de modo
+        que cada lote consecutivo del modelo se rellena (padding) lo mínimo posible.
+        Devuelve los vectores en el mismo orden que `texts`.
+        """
+        order = np.argsort(self.embeddings.token_lengths(texts), kind="stable")
+
+        sorted_vectors = self.embeddings.embed_array([texts[i] for i in order])
+        vectors = np.empty_like(sorted_vectors)
+        vectors[order] = sorted_vectors
+        return vectors
+
+    def _build_index(self, vectors: np.ndarray) -> faiss.Index:
+        """
+        Construye el índice aproximado (HNSW con almacenamiento SQ8 por defecto) con
+        producto interno, equivalente a coseno al estar normalizados los vectores.
+        Los índices cuantizados se entrenan con los propios vectores antes de añadirlos.
+        """
+        index = faiss.index_factory(vectors.shape[1], self.index_factory, faiss.METRIC_INNER_PRODUCT)
+        if hasattr(index, "hnsw"):
+            index.hnsw.efConstruction = self.ef_construction
+        if not index.is_trained:
+            index.train(vectors)
+        index.add(vectors)
+        return index
+
+    def _tune_search(self, index):
+        """Aplica los parámetros de búsqueda (efSearch en HNSW, nprobe en IVF) al índice."""
+        if hasattr(index, "hnsw"):
+            index.hnsw.efSearch = self.ef_search
+        if hasattr(index, "nprobe"):
+            index.nprobe = self.nprobe
+
+    def _load_vectorstore(self) -> FAISS:
+        """
+        Carga el vectorstore persistido sin volver a procesar los PDFs.
+        El índice completo se abre una sola vez con IO_FLAG_MMAP_IFC: queda mapeado desde
+        disco (compartido entre workers) y solo el docstore se deserializa en RAM.
+        """
+        index = faiss.read_index(str(self.index_dir / "index.faiss"), faiss.IO_FLAG_MMAP_IFC)
+        with open(self.index_dir / "index.pkl", "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+
+        print(f"Índice FAISS cargado: {index.ntotal} vectores (mapeado en memoria).")
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+
+    def _get_or_create_vectorstore(self) -> FAISS:
+        """Carga un vectorstore existente o crea uno nuevo a partir de los PDFs."""
         if self.index_dir.exists():
-            return FAISS.load_local(
-                str(self.index_dir), 
-                self.embeddings, 
-                allow_dangerous_deserialization=True
-            )
+            return self._load_vectorstore()
         else:
-            db = FAISS.from_documents(chunks, self.embeddings)
+            documents = self._load_pdf_documents()
+            chunks = self._split_documents(documents)
+            
+            # Una única matriz contigua (N, d), ya normalizada, que se añade al índice en una sola llamada
+            vectors = self._embed_texts([chunk.page_content for chunk in chunks])
+            db = FAISS(
+                embedding_function=self.embeddings,
+                index=self._build_index(vectors),
+                docstore=InMemoryDocstore({str(i): chunk for i, chunk in enumerate(chunks)}),
+                index_to_docstore_id={i: str(i) for i in range(len(chunks))},
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+            )
             self.index_dir.mkdir(parents=True, exist_ok=True)
             db.save_local(str(self.index_dir))
-            return db
\ No newline at end of file
+            return db
@@ -4,7 +4,6 @@ from typing import AsyncGenerator, Generator, Optional, Dict, Any, List
 
 from langchain.chains import LLMChain
 from langchain_together import ChatTogether
-from langchain.chains import ConversationalRetrievalChain
 from langchain.prompts import PromptTemplate
 from langchain_core.callbacks import CallbackManager
 from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
@@ -12,6 +11,7 @@ from langchain_core.messages import HumanMessage, AIMessage
 
 from domain.prompts import CHATBOT_PROMPT_TEMPLATE, GREETING_MESSAGES, detect_name_from_input, SUMMARY_PROMPT_TEMPLATE
 
+from domain.memory import MAX_SESSION_MESSAGES
 from domain.session_manager import SessionManager  
 
 class ChatbotService:
@@ -19,6 +19,10 @@ class ChatbotService:
     # Agrega estas constantes al inicio de la clase
     BASE_MODEL = "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo"
     MY_ADAPTER = "Jordanqaqqqasdas/chatbot-emocional-v2"
+
+    # Límites del historial enviado al generar el resumen
+    MAX_SUMMARY_CHARS = 8000
+    MAX_SUMMARY_MSGS = MAX_SESSION_MESSAGES
   
     # Inicialización del servicio de chatbot
     def __init__(self, retriever, session_manager):
@@ -26,6 +30,7 @@ class ChatbotService:
         self.retriever = retriever               # Configurar el recuperador de documentos
         self.session_manager = session_manager   # Configurar el gestor de sesiones
         self.llm = self._initialize_llm()
+        self._prompt = PromptTemplate.from_template(CHATBOT_PROMPT_TEMPLATE)
     
     
     def _initialize_llm(self):
@@ -62,23 +67,26 @@ class ChatbotService:
                 yield greeting
                 return
                     
-            # Obtener memoria de la sesión
+            # Recuperar documentos (asíncrono: el embedding y la búsqueda corren fuera del event loop)
+            docs = await self.retriever.ainvoke(user_input) if self.retriever else []
             memory = self.session_manager.get_or_create_memory(session_id)
+            history = memory.recent_messages()
             
-            # Crear cadena de conversación
-            qa_chain = ConversationalRetrievalChain.from_llm(
-                llm=self.llm,
-                retriever=self.retriever,
-                memory=memory,
-                combine_docs_chain_kwargs={"prompt": PromptTemplate.from_template(CHATBOT_PROMPT_TEMPLATE)},
-                return_source_documents=False
+            # Construir el prompt con el historial y el contexto recuperado
+            prompt = self._prompt.format(
+                chat_history=self._format_history(history),
+                context="\n\n".join(doc.page_content for doc in docs),
+                question=user_input
             )
             
             # Generar respuesta en streaming
-            response_stream = qa_chain.astream({"question": user_input})
-            async for chunk in response_stream:
-                if content := chunk.get("answer", ""):
+            answer_parts = []
+            async for chunk in self.llm.astream([HumanMessage(content=prompt)]):
+                if content := chunk.content:
+                    answer_parts.append(content)
                     yield content
+            
+            memory.add_turn(user_input, "".join(answer_parts))
                     
         except Exception as e:
             error_msg = "Lo siento, ocurrió un error al procesar tu mensaje. Por favor, inténtalo de nuevo."
@@ -87,8 +95,14 @@ class ChatbotService:
         
 
 
+    @staticmethod
+    def _format_history(history: list) -> str:
+        """Convierte las tuplas (rol, texto) de la memoria en texto para el prompt."""
+        prefixes = {"user": "Usuario", "assistant": "Asistente"}
+        return "\n".join(f"{prefixes[role]}: {content}" for role, content in history)
+
     # Generacion de resumen de historial por session_id
-    def generate_summary(self, chat_history: list) -> str:
+    async def generate_summary(self, chat_history: list) -> str:
         """
         Genera un resumen estructurado del historial de chat usando un prompt de sistema.
         
@@ -99,11 +113,19 @@ class ChatbotService:
             str: Resumen formateado.
         """
         try:
-            # Convertir el historial a un formato de texto
-            formatted_history = "\n".join(
-                f"{msg['role'].capitalize()}: {msg['content']}" 
-                for msg in chat_history
-            )
+            # Convertir los últimos mensajes del historial a texto
+            lines = [
+                f"{msg['role'].capitalize()}: {msg['content']}"
+                for msg in chat_history[-self.MAX_SUMMARY_MSGS:]
+            ]
+            
+            # Descartar los mensajes más antiguos hasta respetar el límite de caracteres
+            total_chars = sum(len(line) + 1 for line in lines)
+            start = 0
+            while total_chars > self.MAX_SUMMARY_CHARS and start < len(lines) - 1:
+                total_chars -= len(lines[start]) + 1
+                start += 1
+            formatted_history = "\n".join(lines[start:])[-self.MAX_SUMMARY_CHARS:]
             
             # Crear el prompt
             prompt = PromptTemplate(
@@ -115,9 +137,9 @@ class ChatbotService:
             chain = LLMChain(llm=self.llm, prompt=prompt)
             
             # Generar el resumen
-            summary = chain.run(chat_history=formatted_history)
+            result = await chain.ainvoke({"chat_history": formatted_history})
             
-            return summary.strip()
+            return result["text"].strip()
             
         except Exception as e:
             print(f"Error al generar el resumen: {e}")
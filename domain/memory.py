@@ -0,0 +1,40 @@
+from collections import deque
+from typing import Deque, List, Tuple
+
+# Mensajes retenidos por sesión; también es el máximo que se envía al generar el resumen
+MAX_SESSION_MESSAGES = 40
+
+
+# Memoria de conversación ligera basada en un buffer circular
+class RingBufferMemory:
+    """
+    Guarda los mensajes como tuplas (rol, texto) en un deque de tamaño fijo,
+    sin objetos de mensaje ni historial de LangChain por sesión.
+    """
+
+    def __init__(self, k: int = 4, max_messages: int = MAX_SESSION_MESSAGES):
+        """
+        Args:
+            k: Turnos (pregunta + respuesta) que se devuelven como historial reciente.
+            max_messages: Mensajes retenidos por sesión (para el resumen).
+        """
+        self.k = k
+        self._messages: Deque[Tuple[str, str]] = deque(maxlen=max_messages)
+
+    @property
+    def messages(self) -> List[Tuple[str, str]]:
+        """Todos los mensajes retenidos, del más antiguo al más reciente."""
+        return list(self._messages)
+
+    def recent_messages(self) -> List[Tuple[str, str]]:
+        """Devuelve los últimos `k` turnos como lista de tuplas (rol, texto)."""
+        return self.messages[-2 * self.k:]
+
+    def add_turn(self, user_input: str, answer: str) -> None:
+        """Añade la pregunta del usuario y la respuesta del asistente al buffer."""
+        self._messages.append(("user", user_input))
+        self._messages.append(("assistant", answer))
+
+    def clear(self) -> None:
+        """Vacía el historial."""
+        self._messages.clear()
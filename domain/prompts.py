@@ -1,3 +1,5 @@
+import re
+
 CHATBOT_PROMPT_TEMPLATE = """
 Eres un compañero emocional digital que conversa en **español** como un amigo cercano.
 
@@ -61,6 +63,20 @@ Historial de la conversación:
 """
 
 
+# Frases en español que preceden al nombre del usuario
+NAME_TRIGGERS = ("soy", "me llamo", "mi nombre es", "llamo")
+
+# Todas las frases se combinan en un único patrón compilado (una sola pasada sobre el texto);
+# las más largas van primero para que ganen a sus sufijos. El nombre capturado es una
+# palabra de letras Unicode; no se tratan nombres compuestos ni otros órdenes de palabras.
+_NAME_RE = re.compile(
+    r"\b(?:"
+    + "|".join(re.escape(t).replace(r"\ ", r"\s+") for t in sorted(NAME_TRIGGERS, key=len, reverse=True))
+    + r")\s+([^\W\d_]+)",
+    re.IGNORECASE
+)
+
+
 def detect_name_from_input(user_input: str) -> str:
     """
     Detecta el nombre del usuario en su mensaje.
@@ -71,11 +87,5 @@ def detect_name_from_input(user_input: str) -> str:
     Returns:
         Nombre detectado o None
     """
-    palabras_clave = ["soy", "llamo", "es", "nombre"]
-    palabras = user_input.split()
-    
-    for i, palabra in enumerate(palabras):
-        if palabra.lower() in palabras_clave and i + 1 < len(palabras):
-            return palabras[i + 1].capitalize()
-    
-    return None
\ No newline at end of file
+    match = _NAME_RE.search(user_input)
+    return match.group(1).capitalize() if match else None
@@ -1,41 +1,67 @@
-import uuid
+import threading
+from secrets import token_urlsafe
 from typing import Optional, Dict, Any
-from langchain.memory import ConversationBufferWindowMemory
+
+from cachetools import TTLCache
+
+from domain.memory import MAX_SESSION_MESSAGES, RingBufferMemory
 
 # Gestor de sesiones de usuario para el chatbot
 class SessionManager:
 
-    def __init__(self):
-
-        self.sessions: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, max_sessions: int = 10_000, session_ttl: int = 3600):
+        """
+        Args:
+            max_sessions: Número máximo de sesiones en memoria (se descartan las menos recientes).
+            session_ttl: Segundos de inactividad tras los que una sesión expira.
+        """
+        self.sessions: TTLCache = TTLCache(maxsize=max_sessions, ttl=session_ttl)
+        self._lock = threading.RLock()
 
     def get_or_create_session_id(self, session_id: Optional[str] = None) -> str:
         """Recupera un ID de sesión existente o genera uno nuevo si no se proporciona."""
-        return session_id if session_id else str(uuid.uuid4())
+        return session_id or token_urlsafe(16)
+
+    def _get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Recupera la sesión con una única consulta a la caché, o None si no existe.
+        (TTLCache.get comprueba y luego indexa, y la entrada puede expirar entre ambos pasos.)
+        """
+        with self._lock:
+            try:
+                return self.sessions[session_id]
+            except KeyError:
+                return None
 
     def _get_or_create_session(self, session_id: str) -> Dict[str, Any]:
         """Recupera o crea la estructura de datos de la sesión para un ID dado."""
-        if session_id not in self.sessions:
-            self.sessions[session_id] = {
-                "memory": ConversationBufferWindowMemory(
-                    k=4,
-                    ai_prefix="Asistente",
-                    human_prefix="Usuario",
-                    memory_key="chat_history",
-                    return_messages=True
-                ),
-                "name": None,
-                "greeted": False
-            }
-        return self.sessions[session_id]
-    def get_or_create_memory(self, session_id: str) -> ConversationBufferWindowMemory:
+        with self._lock:
+            session = self._get_session(session_id)
+            if session is None:
+                session = {
+                    "memory": RingBufferMemory(k=4, max_messages=MAX_SESSION_MESSAGES),
+                    "name": None,
+                    "greeted": False
+                }
+            # Reinsertar renueva el TTL: las sesiones expiran por inactividad
+            self.sessions[session_id] = session
+            return session
+
+    def get_or_create_memory(self, session_id: str) -> RingBufferMemory:
         """Recupera o crea la memoria de conversación para una sesión."""
         session = self._get_or_create_session(session_id)
         return session["memory"]    
 
     def clear_session(self, session_id: str) -> None:
         """Elimina todos los datos asociados a una sesión."""
-        self.sessions.pop(session_id, None)
+        with self._lock:
+            self.sessions.pop(session_id, None)
+
+    def active_sessions(self) -> int:
+        """Devuelve el número de sesiones vigentes."""
+        with self._lock:
+            self.sessions.expire()
+            return len(self.sessions)
     
     def save_name(self, session_id: str, name: str) -> None:
         """Guarda el nombre del usuario para una sesión."""
@@ -44,17 +70,18 @@ class SessionManager:
     
     def get_name(self, session_id: str) -> Optional[str]:
         """Recupera el nombre del usuario de una sesión, si existe."""
-        if session_id in self.sessions:
-            return self.sessions[session_id].get("name")
-        return None
+        session = self._get_session(session_id)
+        return session.get("name") if session else None
 
     def has_name(self, session_id: str) -> bool:
         """Verifica si se ha guardado un nombre para la sesión."""
-        return session_id in self.sessions and self.sessions[session_id].get("name") is not None
+        session = self._get_session(session_id)
+        return session is not None and session.get("name") is not None
 
     def has_greeted(self, session_id: str) -> bool:
         """Verifica si el usuario de la sesión ya ha sido saludado."""
-        return session_id in self.sessions and self.sessions[session_id].get("greeted", False)
+        session = self._get_session(session_id)
+        return session is not None and session.get("greeted", False)
     
     def mark_as_greeted(self, session_id: str) -> None:
         """Marca al usuario de una sesión como saludado."""
@@ -71,17 +98,11 @@ class SessionManager:
         Returns:
             Optional[list]: Lista de mensajes en formato de diccionario o None si la sesión no existe.
         """
-        if session_id not in self.sessions:
+        session = self._get_session(session_id)
+        if session is None:
             return None
             
-        memory = self.sessions[session_id]["memory"]
-        messages = memory.chat_memory.messages
+        memory = session["memory"]
         
         # Convertir los mensajes a un formato de diccionario
-        formatted_messages = []
-        for msg in messages:
-            if hasattr(msg, 'content'):
-                role = "user" if msg.type == "human" else "assistant"
-                formatted_messages.append({"role": role, "content": msg.content})
-        
-        return formatted_messages
\ No newline at end of file
+        return [{"role": role, "content": content} for role, content in memory.messages]
\ No newline at end of file
@@ -0,0 +1,39 @@
+"""
+Exporta all-MiniLM-L6-v2 a ONNX y lo cuantiza dinámicamente a INT8.
+
+Uso (requiere las dependencias de requirements-export.txt):
+    pip install -r requirements-export.txt
+    python scripts/export_minilm_onnx.py [--model-id ...] [--output-dir ...]
+"""
+import argparse
+from pathlib import Path
+
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+
+
+def export(model_id: str, output_dir: str) -> None:
+    """Exporta el modelo, guarda el tokenizador y genera model_quantized.onnx."""
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    print(f"Exportando {model_id} a ONNX...")
+    model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+    model.save_pretrained(output_path)
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(output_path)
+
+    print("Aplicando cuantización dinámica INT8...")
+    quantizer = ORTQuantizer.from_pretrained(model)
+    qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_path, quantization_config=qconfig)
+
+    print(f"Modelo cuantizado guardado en {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model-id", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--output-dir", default="./models/all-MiniLM-L6-v2-onnx-int8")
+    args = parser.parse_args()
+    export(args.model_id, args.output_dir)
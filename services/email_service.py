@@ -1,39 +1,105 @@
 import os
-import smtplib
+import asyncio
+from typing import Optional
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+
+import aiosmtplib
 from dotenv import load_dotenv
 
 load_dotenv()  # Carga las variables de entorno desde .env
 
-def send_summary_email(to_email: str, summary_text: str) -> bool:
+# Configuración SMTP leída una sola vez; falla al importar si falta alguna variable
+_SMTP_USER = os.environ["SMTP_USERNAME"]
+_SMTP_PASS = os.environ["SMTP_PASSWORD"]
+_SMTP_SERVER = os.environ["SMTP_SERVER"]
+_SMTP_PORT = int(os.environ["SMTP_PORT"])
+
+_SUBJECT = "Resumen de tu Conversación"
+
+# Conexión SMTP compartida entre envíos (se abre bajo demanda)
+_smtp: Optional[aiosmtplib.SMTP] = None
+_smtp_lock = asyncio.Lock()
+
+
+def _build_message(to_email: str, summary_text: str) -> MIMEMultipart:
+    """Construye el mensaje de correo con el resumen."""
+    msg = MIMEMultipart()
+    msg['From'] = _SMTP_USER
+    msg['To'] = to_email
+    msg['Subject'] = _SUBJECT
+
+    # Cuerpo del correo
+    msg.attach(MIMEText(summary_text, 'plain'))
+    return msg
+
+
+async def _get_smtp() -> aiosmtplib.SMTP:
+    """Devuelve la conexión SMTP compartida, conectando y autenticando si hace falta."""
+    global _smtp
+    if _smtp is None or not _smtp.is_connected:
+        _discard_smtp()
+        smtp = aiosmtplib.SMTP(
+            hostname=_SMTP_SERVER,
+            port=_SMTP_PORT,
+            start_tls=True
+        )
+        await smtp.connect()
+        try:
+            await smtp.login(_SMTP_USER, _SMTP_PASS)
+        except Exception:
+            smtp.close()
+            raise
+        _smtp = smtp
+    return _smtp
+
+
+def _discard_smtp() -> None:
+    """Cierra el socket de la conexión compartida (si existe) y la descarta."""
+    global _smtp
+    if _smtp is not None and _smtp.is_connected:
+        _smtp.close()
+    _smtp = None
+
+
+async def send_summary_email_async(to_email: str, summary_text: str) -> bool:
     """
-    Envía un correo con el resumen de la conversación.
-    
+    Envía un correo con el resumen de la conversación sin bloquear el event loop,
+    reutilizando la conexión SMTP entre envíos.
+
     Args:
         to_email (str): Correo electrónico del destinatario.
         summary_text (str): Texto del resumen a enviar.
-    
+
     Returns:
         bool: True si el envío fue exitoso, False en caso contrario.
     """
-    try:
-        # Configuración del mensaje
-        msg = MIMEMultipart()
-        msg['From'] = os.getenv('SMTP_USERNAME')
-        msg['To'] = to_email
-        msg['Subject'] = "Resumen de tu Conversación"
-        
-        # Cuerpo del correo
-        msg.attach(MIMEText(summary_text, 'plain'))
-        
-        # Configuración del servidor SMTP
-        with smtplib.SMTP(os.getenv('SMTP_SERVER'), int(os.getenv('SMTP_PORT'))) as server:
-            server.starttls()
-            server.login(os.getenv('SMTP_USERNAME'), os.getenv('SMTP_PASSWORD'))
-            server.send_message(msg)
-        
-        return True
-    except Exception as e:
-        print(f"Error al enviar el correo: {e}")
-        return False
\ No newline at end of file
+    msg = _build_message(to_email, summary_text)
+
+    async with _smtp_lock:
+        try:
+            try:
+                smtp = await _get_smtp()
+                await smtp.send_message(msg)
+            except aiosmtplib.SMTPServerDisconnected:
+                # El servidor cerró la conexión reutilizada: reconectar y reintentar una vez
+                _discard_smtp()
+                smtp = await _get_smtp()
+                await smtp.send_message(msg)
+
+            return True
+        except Exception as e:
+            print(f"Error al enviar el correo: {e}")
+            _discard_smtp()
+            return False
+
+
+async def close_smtp() -> None:
+    """Cierra la conexión SMTP compartida. Se llama al apagar la aplicación."""
+    async with _smtp_lock:
+        if _smtp is not None and _smtp.is_connected:
+            try:
+                await _smtp.quit()
+            except aiosmtplib.SMTPException:
+                pass
+        _discard_smtp()
@@ -1,7 +1,9 @@
-import json
-from typing import Optional
+import os
+import time
+from typing import AsyncGenerator, Optional
 from contextlib import asynccontextmanager
 
+import orjson
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -11,7 +13,7 @@ from pydantic import BaseModel, Field, validator
 from domain.chatbot import ChatbotService
 from domain.session_manager import SessionManager
 from data.rag_loader import RAGSystem
-from services.email_service import send_summary_email
+from services.email_service import close_smtp, send_summary_email_async
 
 # -- Modelos de Datos (Pydantic) --
 
@@ -44,10 +46,16 @@ async def lifespan(app: FastAPI):
     Inicializa los servicios al arrancar y los limpia al apagar.
     """
     print("Iniciando servicios...")
-    # 1. Inicializar el sistema RAG
+    # 1. Inicializar el sistema RAG (la construcción del índice usa todos los núcleos)
     rag_system = RAGSystem()
     rag_system.setup()
     
+    # Limitar los hilos por worker al servir consultas para no saturar los núcleos
+    rag_system.limit_threads(int(os.getenv("WORKER_THREADS", "1")))
+    
+    # Calentar el modelo de embeddings para que la primera petición no pague la inicialización
+    rag_system.embeddings.embed_query("warmup")
+    
     # 2. Inicializar el gestor de sesiones
     session_manager = SessionManager()
     
@@ -64,7 +72,11 @@ async def lifespan(app: FastAPI):
     
     yield
     
-    # Código de limpieza al apagar (si fuera necesario)
+    # Código de limpieza al apagar
+    retriever = rag_system.get_retriever()
+    if retriever is not None:
+        await retriever.batcher.aclose()
+    await close_smtp()
     service_instances.clear()
     print("Servicios detenidos.")
 
@@ -92,9 +104,18 @@ app.add_middleware(
 @app.get("/health")
 async def health_check():
 
-    return {"status": "healthy", "version": app.version}
+    session_manager = service_instances.get('session_manager')
+    return {
+        "status": "healthy",
+        "version": app.version,
+        "active_sessions": session_manager.active_sessions() if session_manager else 0
+    }
 
 
+# Umbrales para agrupar tokens en un mismo evento SSE
+SSE_FLUSH_CHARS = 32
+SSE_FLUSH_SECONDS = 0.05
+
 @app.post("/chat/stream")
 async def chat_stream_endpoint(request: Request, message: ChatMessage):
    
@@ -106,14 +127,29 @@ async def chat_stream_endpoint(request: Request, message: ChatMessage):
     session_id = chatbot_service.session_manager.get_or_create_session_id(message.session_id)
     accept_header = request.headers.get("accept", "")
 
-    async def generate_sse_events():
-        """Generador asíncrono para la respuesta en streaming (SSE)."""
+    async def generate_sse_events() -> AsyncGenerator[bytes, None]:
+        """
+        Generador asíncrono para la respuesta en streaming (SSE).
+        Agrupa los tokens y emite un evento al acumular SSE_FLUSH_CHARS caracteres
+        o al pasar SSE_FLUSH_SECONDS desde el último envío.
+        """
+        buffer = []
+        buffered_chars = 0
+        last_flush = time.monotonic()
         try:
             async for chunk in chatbot_service.stream_response(message.user_input, session_id):
-                yield f"data: {json.dumps({'message': chunk})}\n\n"
+                buffer.append(chunk)
+                buffered_chars += len(chunk)
+                if buffered_chars >= SSE_FLUSH_CHARS or time.monotonic() - last_flush >= SSE_FLUSH_SECONDS:
+                    yield b"data: " + orjson.dumps({"message": "".join(buffer)}) + b"\n\n"
+                    buffer.clear()
+                    buffered_chars = 0
+                    last_flush = time.monotonic()
+            if buffer:
+                yield b"data: " + orjson.dumps({"message": "".join(buffer)}) + b"\n\n"
         except Exception as e:
             error_message = f"Error en el stream: {e}"
-            yield f"data: {json.dumps({'error': error_message})}\n\n"
+            yield b"data: " + orjson.dumps({"error": error_message}) + b"\n\n"
     
     if "text/event-stream" in accept_header:
         # Respuesta con Server-Sent Events
@@ -129,9 +165,10 @@ async def chat_stream_endpoint(request: Request, message: ChatMessage):
     else:
         # Respuesta JSON completa
         try:
-            full_response = "".join([
-                chunk async for chunk in chatbot_service.stream_response(message.user_input, session_id)
-            ])
+            parts = []
+            async for chunk in chatbot_service.stream_response(message.user_input, session_id):
+                parts.append(chunk)
+            full_response = "".join(parts)
             return JSONResponse(
                 content={
                     "message": full_response,
@@ -165,10 +202,10 @@ async def create_summary(request: SummaryRequest):
         if not chatbot_service:
             raise HTTPException(status_code=500, detail="Error interno del servidor")
         
-        summary = chatbot_service.generate_summary(history)
+        summary = await chatbot_service.generate_summary(history)
         
         # 3. Enviar el correo
-        if not send_summary_email(request.email, summary):
+        if not await send_summary_email_async(request.email, summary):
             raise HTTPException(status_code=500, detail="Error al enviar el correo")
         
         return {"message": "Resumen enviado exitosamente"}
@@ -0,0 +1,57 @@
+import pytest
+
+import domain.chatbot as chatbot
+from domain.chatbot import ChatbotService
+
+
+class StubChain:
+    """Sustituye a LLMChain y guarda el historial que recibiría el LLM."""
+
+    calls = []
+
+    def __init__(self, llm, prompt):
+        pass
+
+    async def ainvoke(self, inputs):
+        StubChain.calls.append(inputs["chat_history"])
+        return {"text": " resumen "}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    StubChain.calls = []
+    monkeypatch.setattr(chatbot, "LLMChain", StubChain)
+    service = ChatbotService.__new__(ChatbotService)
+    service.llm = None
+    return service
+
+
+def user(content):
+    return {"role": "user", "content": content}
+
+
+async def test_summary_keeps_only_the_last_messages(service):
+    history = [user(f"m{i}") for i in range(50)]
+
+    assert await service.generate_summary(history) == "resumen"
+
+    assert StubChain.calls == ["\n".join(f"User: m{i}" for i in range(10, 50))]
+
+
+async def test_summary_drops_whole_oldest_lines_over_the_char_budget(service):
+    # Cada línea ocupa 507 caracteres con el salto: caben 15 dentro de 8000
+    lines = [f"User: {i:03d}" + "x" * 497 for i in range(30)]
+
+    await service.generate_summary([user(line.removeprefix("User: ")) for line in lines])
+
+    assert StubChain.calls == ["\n".join(lines[-15:])]
+
+
+async def test_summary_keeps_the_tail_of_a_single_oversized_message(service):
+    content = "a" * 10000 + "b" * 10000
+
+    await service.generate_summary([user(content)])
+
+    (sent,) = StubChain.calls
+    assert len(sent) == ChatbotService.MAX_SUMMARY_CHARS
+    assert sent == content[-ChatbotService.MAX_SUMMARY_CHARS:]
@@ -0,0 +1,83 @@
+import aiosmtplib
+import pytest
+
+import services.email_service as email_service
+
+
+class FakeSMTP:
+    """Sustituye a aiosmtplib.SMTP; `send_errors` se lanzan, en orden, en los siguientes envíos."""
+
+    instances = []
+    send_errors = []
+    login_error = None
+
+    def __init__(self, **kwargs):
+        self.is_connected = False
+        self.logins = 0
+        self.sent = []
+        self.closed = False
+        FakeSMTP.instances.append(self)
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def login(self, username, password):
+        self.logins += 1
+        if FakeSMTP.login_error is not None:
+            raise FakeSMTP.login_error
+
+    async def send_message(self, msg):
+        if FakeSMTP.send_errors:
+            raise FakeSMTP.send_errors.pop(0)
+        self.sent.append(msg["To"])
+
+    def close(self):
+        self.closed = True
+        self.is_connected = False
+
+
+@pytest.fixture(autouse=True)
+def fake_smtp(monkeypatch):
+    FakeSMTP.instances = []
+    FakeSMTP.send_errors = []
+    FakeSMTP.login_error = None
+    monkeypatch.setattr(aiosmtplib, "SMTP", FakeSMTP)
+    monkeypatch.setattr(email_service, "_smtp", None)
+
+
+async def test_second_send_reuses_the_connection():
+    assert await email_service.send_summary_email_async("a@example.com", "resumen")
+    assert await email_service.send_summary_email_async("b@example.com", "resumen")
+
+    (smtp,) = FakeSMTP.instances
+    assert smtp.logins == 1
+    assert smtp.sent == ["a@example.com", "b@example.com"]
+
+
+async def test_disconnect_reconnects_once_and_retries():
+    FakeSMTP.send_errors = [aiosmtplib.SMTPServerDisconnected("cerrada")]
+
+    assert await email_service.send_summary_email_async("a@example.com", "resumen")
+
+    old, new = FakeSMTP.instances
+    assert old.closed and old.sent == []
+    assert new.logins == 1 and new.sent == ["a@example.com"]
+
+
+async def test_repeated_disconnect_is_not_retried_again():
+    FakeSMTP.send_errors = [aiosmtplib.SMTPServerDisconnected("cerrada")] * 3
+
+    assert not await email_service.send_summary_email_async("a@example.com", "resumen")
+
+    assert len(FakeSMTP.instances) == 2
+    assert email_service._smtp is None
+
+
+async def test_failed_login_closes_the_socket():
+    FakeSMTP.login_error = aiosmtplib.SMTPAuthenticationError(535, "credenciales")
+
+    assert not await email_service.send_summary_email_async("a@example.com", "resumen")
+
+    (smtp,) = FakeSMTP.instances
+    assert smtp.closed
+    assert email_service._smtp is None
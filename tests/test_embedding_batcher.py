@@ -0,0 +1,141 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import faiss
+import numpy as np
+import pytest
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+from data.embedding_batcher import BatchedRetriever, EmbeddingBatcher
+
+DIM = 4
+
+
+class StubEmbeddings:
+    """Embeddings de prueba: la consulta "docN" se convierte en el vector unitario N."""
+
+    def __init__(self, error: Exception = None, delay: float = 0.0):
+        self.error = error
+        self.delay = delay
+        self.calls = []
+
+    def embed_array(self, texts):
+        self.calls.append(list(texts))
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        vectors = np.zeros((len(texts), DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            vectors[row, int(text.removeprefix("doc"))] = 1.0
+        return vectors
+
+
+def make_vectorstore(embeddings):
+    """Vectorstore mínimo con lo que usa EmbeddingBatcher: índice, docstore y mapeo de ids."""
+    index = faiss.IndexFlatIP(DIM)
+    index.add(np.eye(DIM, dtype=np.float32))
+    return SimpleNamespace(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore({str(i): Document(page_content=f"doc{i}") for i in range(DIM)}),
+        index_to_docstore_id={i: str(i) for i in range(DIM)},
+    )
+
+
+async def test_concurrent_searches_get_their_own_results():
+    embeddings = StubEmbeddings()
+    batcher = EmbeddingBatcher(make_vectorstore(embeddings), k=1, max_wait=0.05)
+    try:
+        queries = [f"doc{i}" for i in range(DIM)]
+        results = await asyncio.gather(*(batcher.search(query) for query in queries))
+    finally:
+        await batcher.aclose()
+
+    assert [[doc.page_content for doc in docs] for docs in results] == [[query] for query in queries]
+    # Todas las consultas se resolvieron en un único lote
+    assert embeddings.calls == [queries]
+
+
+async def test_embedding_error_reaches_every_caller():
+    batcher = EmbeddingBatcher(make_vectorstore(StubEmbeddings(RuntimeError("fallo"))), k=1, max_wait=0.05)
+    try:
+        results = await asyncio.gather(
+            *(batcher.search(f"doc{i}") for i in range(3)),
+            return_exceptions=True
+        )
+    finally:
+        await batcher.aclose()
+
+    assert len(results) == 3
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_worker_keeps_running_after_an_error():
+    embeddings = StubEmbeddings(RuntimeError("fallo"))
+    batcher = EmbeddingBatcher(make_vectorstore(embeddings), k=1)
+    try:
+        with pytest.raises(RuntimeError):
+            await batcher.search("doc0")
+        embeddings.error = None
+        docs = await batcher.search("doc2")
+    finally:
+        await batcher.aclose()
+
+    assert [doc.page_content for doc in docs] == ["doc2"]
+
+
+async def test_aclose_cancels_the_batch_being_embedded():
+    batcher = EmbeddingBatcher(make_vectorstore(StubEmbeddings(delay=0.5)), k=1)
+    search = asyncio.create_task(batcher.search("doc0"))
+    await asyncio.sleep(0.1)
+
+    await batcher.aclose()
+
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(search, timeout=1)
+
+
+class SpyIndex:
+    """Envuelve un índice HNSW y registra cada llamada a search (filas, efSearch)."""
+
+    def __init__(self, index):
+        self.index = index
+        self.hnsw = index.hnsw
+        self.calls = []
+
+    def search(self, vectors, k, params=None):
+        self.calls.append((len(vectors), params.efSearch if params is not None else None))
+        return self.index.search(vectors, k, params=params)
+
+
+def test_mixed_ef_search_batch_keeps_each_row_results():
+    index = faiss.IndexHNSWFlat(DIM, 32, faiss.METRIC_INNER_PRODUCT)
+    index.add(np.eye(DIM, dtype=np.float32))
+    vectorstore = make_vectorstore(StubEmbeddings())
+    vectorstore.index = SpyIndex(index)
+    batcher = EmbeddingBatcher(vectorstore, k=1)
+
+    results = batcher._search_batch(["doc0", "doc1", "doc2", "doc3"], [8, None, 8, None])
+
+    assert [[doc.page_content for doc in docs] for docs in results] == [["doc0"], ["doc1"], ["doc2"], ["doc3"]]
+    # Una búsqueda por cada valor distinto de efSearch
+    assert sorted(vectorstore.index.calls, key=str) == [(2, 8), (2, None)]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("a" * 19, 8),
+    ("a" * 20, None),
+    ("  " + "a" * 19 + "  ", 8),
+])
+def test_short_queries_use_the_short_ef_search(query, expected):
+    retriever = BatchedRetriever(batcher=EmbeddingBatcher(make_vectorstore(StubEmbeddings())), short_query_ef_search=8)
+
+    assert retriever._ef_search_for(query) == expected
+
+
+def test_short_query_ef_search_can_be_disabled():
+    retriever = BatchedRetriever(batcher=EmbeddingBatcher(make_vectorstore(StubEmbeddings())))
+
+    assert retriever._ef_search_for("hola") is None
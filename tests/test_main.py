@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+import services.main as main
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+class StubChatbotService:
+    """Emite los tokens indicados; un número en la lista avanza el reloj esos segundos."""
+
+    def __init__(self, clock, tokens, error=None):
+        self.clock = clock
+        self.tokens = tokens
+        self.error = error
+        self.session_manager = SimpleNamespace(get_or_create_session_id=lambda session_id: "sesion")
+
+    async def stream_response(self, user_input, session_id):
+        for token in self.tokens:
+            if isinstance(token, float):
+                self.clock.now += token
+            else:
+                yield token
+        if self.error is not None:
+            raise self.error
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(main, "time", clock)
+    yield clock
+    main.service_instances.clear()
+
+
+def stream_events(service):
+    main.service_instances["chatbot_service"] = service
+    response = TestClient(main.app).post(
+        "/chat/stream",
+        json={"user_input": "hola"},
+        headers={"accept": "text/event-stream"}
+    )
+    assert response.status_code == 200
+    frames = response.content.split(b"\n\n")
+    assert frames[-1] == b""
+    return [orjson.loads(frame.removeprefix(b"data: ")) for frame in frames[:-1]]
+
+
+def test_tokens_are_flushed_once_the_char_threshold_is_reached(clock):
+    tokens = ["a" * 10] * 7
+
+    events = stream_events(StubChatbotService(clock, tokens))
+
+    # 40 caracteres superan el umbral de 32; los 30 restantes salen al terminar el stream
+    assert events == [{"message": "a" * 40}, {"message": "a" * 30}]
+
+
+def test_tokens_are_flushed_after_the_time_threshold(clock):
+    tokens = ["ab", "cd", 0.06, "ef", "gh"]
+
+    events = stream_events(StubChatbotService(clock, tokens))
+
+    assert events == [{"message": "abcdef"}, {"message": "gh"}]
+
+
+def test_stream_below_the_threshold_is_sent_when_it_ends(clock):
+    events = stream_events(StubChatbotService(clock, ["ho", "la"]))
+
+    assert events == [{"message": "hola"}]
+
+
+def test_stream_error_is_sent_as_an_error_frame(clock):
+    service = StubChatbotService(clock, ["a" * 32, "b"], error=RuntimeError("fallo"))
+
+    events = stream_events(service)
+
+    assert events == [{"message": "a" * 32}, {"error": "Error en el stream: fallo"}]
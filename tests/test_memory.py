@@ -0,0 +1,22 @@
+from domain.memory import RingBufferMemory
+
+
+def test_recent_messages_returns_the_last_k_turns():
+    memory = RingBufferMemory(k=2)
+    for i in range(5):
+        memory.add_turn(f"pregunta {i}", f"respuesta {i}")
+
+    assert memory.recent_messages() == [
+        ("user", "pregunta 3"), ("assistant", "respuesta 3"),
+        ("user", "pregunta 4"), ("assistant", "respuesta 4"),
+    ]
+
+
+def test_messages_are_capped_at_max_messages():
+    memory = RingBufferMemory(k=2, max_messages=6)
+    for i in range(5):
+        memory.add_turn(f"pregunta {i}", f"respuesta {i}")
+
+    assert len(memory.messages) == 6
+    assert memory.messages[0] == ("user", "pregunta 2")
+    assert memory.messages[-1] == ("assistant", "respuesta 4")
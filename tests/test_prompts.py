@@ -0,0 +1,13 @@
+import pytest
+
+from domain.prompts import detect_name_from_input
+
+
+@pytest.mark.parametrize("user_input, expected", [
+    ("esto es difícil", None),
+    ("me  llamo José", "José"),
+    ("Mi nombre es Zoë", "Zoë"),
+    ("me llamo 123", None),
+])
+def test_detect_name_from_input(user_input, expected):
+    assert detect_name_from_input(user_input) == expected
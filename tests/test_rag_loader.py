@@ -0,0 +1,56 @@
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from data.rag_loader import RAGSystem
+
+
+class StubEmbeddings:
+    """Embeddings de prueba: cada texto se convierte en [longitud, índice del texto]."""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.calls = []
+
+    def token_lengths(self, texts):
+        return [len(text) for text in texts]
+
+    def embed_array(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(text), self.texts.index(text)] for text in texts], dtype=np.float32)
+
+
+def test_embed_texts_returns_vectors_in_input_order():
+    texts = ["mediano", "a", "un texto bastante largo", "bb", "otro"]
+    rag = RAGSystem.__new__(RAGSystem)
+    rag.embeddings = StubEmbeddings(texts)
+
+    vectors = rag._embed_texts(texts)
+
+    # El modelo recibe los textos ordenados por longitud...
+    assert rag.embeddings.calls == [sorted(texts, key=len)]
+    # ...pero los vectores vuelven en el orden original
+    np.testing.assert_array_equal(vectors[:, 1], np.arange(len(texts)))
+
+
+def test_index_round_trips_through_save_and_mmap_load(tmp_path):
+    texts = [f"fragmento {'x' * i}" for i in range(50)]
+    rag = RAGSystem.__new__(RAGSystem)
+    rag.embeddings = StubEmbeddings(texts)
+    rag.index_dir = tmp_path / "faiss_index"
+    rag.index_factory = "HNSW32,SQ8"
+    rag.ef_construction = 40
+    rag.ef_search = 12
+    rag.nprobe = 8
+    rag._load_pdf_documents = lambda: [Document(page_content=text) for text in texts]
+    rag._split_documents = lambda documents: documents
+
+    built = rag._get_or_create_vectorstore()
+    loaded = rag._get_or_create_vectorstore()
+    rag._tune_search(loaded.index)
+
+    assert isinstance(loaded.index, faiss.IndexHNSWSQ)
+    assert loaded.index.ntotal == built.index.ntotal == len(texts)
+    assert loaded.index.hnsw.efSearch == rag.ef_search
+    assert loaded.index_to_docstore_id == built.index_to_docstore_id
+    assert loaded.docstore.search(loaded.index_to_docstore_id[7]).page_content == texts[7]
@@ -0,0 +1,73 @@
+from cachetools import TTLCache
+from fastapi.testclient import TestClient
+
+import services.main as main
+from domain.session_manager import SessionManager
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_manager(max_sessions=10, session_ttl=60):
+    """SessionManager cuya caché usa un reloj controlado por el test."""
+    timer = FakeTimer()
+    manager = SessionManager(max_sessions=max_sessions, session_ttl=session_ttl)
+    manager.sessions = TTLCache(maxsize=max_sessions, ttl=session_ttl, timer=timer)
+    return manager, timer
+
+
+def test_least_recently_used_session_is_evicted_at_max_sessions():
+    manager, _ = make_manager(max_sessions=2)
+    manager.mark_as_greeted("a")
+    manager.mark_as_greeted("b")
+    manager.get_or_create_memory("a")
+
+    manager.mark_as_greeted("c")
+
+    assert not manager.has_greeted("b")
+    assert manager.has_greeted("a")
+    assert manager.has_greeted("c")
+
+
+def test_access_renews_the_ttl():
+    manager, timer = make_manager(session_ttl=60)
+    manager.mark_as_greeted("a")
+
+    timer.now = 50
+    manager.get_or_create_memory("a")
+    timer.now = 100
+
+    assert manager.has_greeted("a")
+
+
+def test_expired_session_reads_as_missing():
+    manager, timer = make_manager(session_ttl=60)
+    manager.save_name("a", "Ana")
+    manager.mark_as_greeted("a")
+
+    timer.now = 61
+
+    assert manager.get_name("a") is None
+    assert manager.has_name("a") is False
+    assert manager.has_greeted("a") is False
+    assert manager.get_history("a") is None
+
+
+def test_health_reports_active_sessions():
+    manager, timer = make_manager(session_ttl=60)
+    manager.mark_as_greeted("a")
+    timer.now = 30
+    manager.mark_as_greeted("b")
+    timer.now = 70
+    main.service_instances["session_manager"] = manager
+    try:
+        response = TestClient(main.app).get("/health")
+    finally:
+        main.service_instances.clear()
+
+    assert response.json()["active_sessions"] == 1